@@ -1,13 +1,18 @@
 # app/api.py
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import List
-import os, psycopg2, requests, textwrap
+import os, sys, math, textwrap
 from pathlib import Path
 from dotenv import load_dotenv
 
 ROOT = Path(__file__).resolve().parents[1]
 load_dotenv(ROOT / ".env")
+sys.path.insert(0, str(ROOT))
+from embed.client import EmbeddingClient
+from db.pg import connect
+from embed.section_store import load_sections
+from app.gateway import ChatGateway, GatewayOverloaded, INTERACTIVE
 
 AOAI_ENDPOINT = os.environ["AZURE_OPENAI_ENDPOINT"].rstrip("/")
 AOAI_API_KEY  = os.environ["AZURE_OPENAI_API_KEY"]
@@ -25,6 +30,7 @@ DB = dict(
 )
 
 app = FastAPI(title="Legal RAG (DE)")
+LLM = ChatGateway(AOAI_ENDPOINT, CHAT_DEPLOY, AOAI_API_KEY, API_VER)  # limits from LLM_* env vars
 
 class AskReq(BaseModel):
     question: str
@@ -40,61 +46,65 @@ class AskResp(BaseModel):
     answer: str
     citations: List[Cite]
 
-def embed(text: str):
-    url = f"{AOAI_ENDPOINT}/openai/deployments/{EMB_DEPLOY}/embeddings?api-version={API_VER}"
-    r = requests.post(url, headers={"api-key": AOAI_API_KEY, "Content-Type":"application/json"},
-                      json={"input":[text]}, timeout=60)
-    r.raise_for_status()
-    return r.json()["data"][0]["embedding"]
+EMBEDDER = EmbeddingClient(AOAI_ENDPOINT, EMB_DEPLOY, AOAI_API_KEY, API_VER, max_retries=0)  # fail fast on /ask
 
-def vec_str(v): return "[" + ",".join(f"{x:.7f}" for x in v) + "]"
+def embed(text: str):
+    return EMBEDDER.embed_one(text)  # float32 vector
 
-def retrieve(question: str, k: int, law: str):
-    qvec = vec_str(embed(question))
-    conn = psycopg2.connect(**DB)
-    with conn, conn.cursor() as cur:
-        cur.execute("""
-            SELECT c.section_number, c.section_title, c.full_text,
-                   1 - (c.embedding <=> %s::vector) AS sim
-            FROM legal.chunks c
-            JOIN legal.documents d ON d.id = c.document_id
-            WHERE d.law_abbr = %s
-            ORDER BY c.embedding <=> %s::vector
-            LIMIT %s;
-        """, (qvec, law, qvec, k))
-        rows = cur.fetchall()
-    conn.close()
-    return [{"section_number": r[0], "section_title": r[1] or "", "text": r[2], "similarity": float(r[3])} for r in rows]
+def retrieve(cur, question: str, k: int, law: str):
+    qvec = embed(question)  # float32 array, sent to pgvector in binary
+    # ids + scores only; section texts are hydrated lazily from the section store
+    cur.execute("""
+        SELECT c.id, 1 - (c.embedding <=> %b::vector) AS sim
+        FROM legal.chunks c
+        JOIN legal.documents d ON d.id = c.document_id
+        WHERE d.law_abbr = %s
+        ORDER BY c.embedding <=> %b::vector
+        LIMIT %s;
+    """, (qvec, law, qvec, k))
+    rows = cur.fetchall()
+    secs = load_sections([r[0] for r in rows], cur)
+    return [{"section_number": secs[r[0]].section_number, "section_title": secs[r[0]].section_title,
+             "section": secs[r[0]], "similarity": float(r[1])} for r in rows if r[0] in secs]
 
 def build_context(docs, max_chars=8000):
     parts, used = [], 0
     for d in docs:
         header = f"§ {d['section_number']} {d['section_title']}".strip()
-        snippet = textwrap.shorten(" ".join(d["text"].split()), width=1200, placeholder=" …")
+        snippet = textwrap.shorten(" ".join(d["section"].text.split()), width=1200, placeholder=" …")
         chunk = f"{header}\n{snippet}"
         if used + len(chunk) > max_chars: break
         parts.append(chunk); used += len(chunk)
     return "\n\n---\n\n".join(parts)
 
-def ask_llm(question: str, context: str):
-    url = f"{AOAI_ENDPOINT}/openai/deployments/{CHAT_DEPLOY}/chat/completions?api-version={API_VER}"
+def ask_llm(question: str, context: str, priority: int = INTERACTIVE):
     sys = ("Du bist ein vorsichtiger juristischer Assistent (DE). "
            "Antworte präzise in Deutsch und zitiere immer die relevanten Paragraphen "
            "aus dem Kontext als (§ Nummer – Titel). Wenn der Kontext nicht reicht, sag das klar.")
     user = (f"Frage:\n{question}\n\nKontextauszüge:\n{context}\n\n"
             "Anweisung: Kurze, sachliche Antwort mit Zitaten in Klammern, z. B. (§ 242 – Diebstahl).")
-    r = requests.post(url, headers={"api-key": AOAI_API_KEY, "Content-Type":"application/json"},
-                      json={"messages":[{"role":"system","content":sys},{"role":"user","content":user}],
-                            "temperature":0.2, "max_tokens":450}, timeout=120)
-    r.raise_for_status()
-    return r.json()["choices"][0]["message"]["content"]
+    data = LLM.complete({"messages":[{"role":"system","content":sys},{"role":"user","content":user}],
+                         "temperature":0.2, "max_tokens":450}, priority=priority)
+    return data["choices"][0]["message"]["content"]
 
 @app.post("/ask", response_model=AskResp)
 def ask(body: AskReq):
-    docs = retrieve(body.question, k=body.k, law=body.law)
-    ctx  = build_context(docs)
-    ans  = ask_llm(body.question, ctx)
+    conn = connect(**DB)
+    with conn, conn.cursor() as cur:
+        docs = retrieve(cur, body.question, k=body.k, law=body.law)
+        ctx  = build_context(docs)  # store misses read their text through cur
+    conn.close()
+    try:
+        ans = ask_llm(body.question, ctx)
+    except GatewayOverloaded as ex:
+        raise HTTPException(status_code=503, detail=str(ex),
+                            headers={"Retry-After": str(math.ceil(ex.retry_after))})
     cits = [Cite(section_number=d["section_number"], section_title=d["section_title"], similarity=d["similarity"]) for d in docs]
     # Optional footer disclaimer
     ans += "\n\n*Hinweis: Keine Rechtsberatung. Angaben ohne Gewähr; prüfen Sie stets den Gesetzestext.*"
     return AskResp(answer=ans, citations=cits)
+
+@app.get("/metrics/llm")
+def llm_metrics():
+    # queue depth, in-flight count, shed/retry counters and recent queue wait percentiles
+    return LLM.metrics()
@@ -0,0 +1,165 @@
+# app/gateway.py
+# Chat-completion gateway: bounded concurrency, priority wait queue,
+# Retry-After aware backoff on 429/5xx and fast load shedding.
+import os, time, heapq, itertools, threading
+from collections import deque
+from typing import Optional
+import requests
+from embed.client import RETRY_STATUS, eprint, retry_after_sec
+
+INTERACTIVE = 0   # /ask
+BATCH       = 10  # bulk callers; behind INTERACTIVE waiters of the same gateway
+
+MAX_BACKOFF_SEC = 30
+
+class GatewayOverloaded(RuntimeError):
+    """Raised instead of queueing further; callers should answer 503 with Retry-After."""
+    def __init__(self, msg: str, retry_after: float = 1.0):
+        super().__init__(msg)
+        self.retry_after = retry_after
+
+class ChatGateway:
+    """Thread-safe front door for Azure chat completions.
+
+    At most `max_inflight` calls run at once; up to `max_queue` more wait, ordered
+    by priority then arrival. When the queue is full, a caller with a better
+    priority evicts the newest worst-priority waiter; otherwise it is shed. A
+    caller that waits longer than `max_wait` sec, or whose call (queueing and
+    retries included) would run past `max_call_sec`, gets GatewayOverloaded.
+
+    All of this is per instance, i.e. per process: each uvicorn worker and each
+    script has its own gateway, so priorities only order callers sharing one.
+    Limits fall back to LLM_* env vars, read at construction time.
+    """
+
+    def __init__(self, endpoint: Optional[str] = None, deployment: Optional[str] = None,
+                 api_key: Optional[str] = None, api_version: Optional[str] = None,
+                 max_inflight: Optional[int] = None, max_queue: Optional[int] = None,
+                 max_wait: Optional[float] = None, max_retries: Optional[int] = None,
+                 max_call_sec: Optional[float] = None, timeout: int = 120):
+        endpoint    = endpoint    or os.getenv("AZURE_OPENAI_ENDPOINT")
+        deployment  = deployment  or os.getenv("AZURE_CHAT_DEPLOYMENT")
+        api_key     = api_key     or os.getenv("AZURE_OPENAI_API_KEY")
+        api_version = api_version or os.getenv("AZURE_API_VERSION", "2024-05-01-preview")
+        if not all([endpoint, deployment, api_key]):
+            raise RuntimeError("Missing Azure env vars. Check .env: AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_CHAT_DEPLOYMENT.")
+        self.url = f"{endpoint.rstrip('/')}/openai/deployments/{deployment}/chat/completions?api-version={api_version}"
+        self.max_inflight = max_inflight or int(os.getenv("LLM_MAX_INFLIGHT", "4"))
+        self.max_queue    = max_queue if max_queue is not None else int(os.getenv("LLM_MAX_QUEUE", "32"))
+        self.max_wait     = max_wait if max_wait is not None else float(os.getenv("LLM_MAX_QUEUE_WAIT_SEC", "10"))
+        self.max_retries  = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "4"))
+        self.max_call_sec = max_call_sec if max_call_sec is not None else float(os.getenv("LLM_MAX_CALL_SEC", "60"))
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json", "api-key": api_key})
+
+        self._cv = threading.Condition()
+        self._inflight = 0
+        self._waiting = []             # heap of (priority, seq)
+        self._evicted = set()          # tickets pushed out by a better-priority caller
+        self._seq = itertools.count()
+        self._waits = deque(maxlen=1024)  # recent queue wait times (sec)
+        self._stats = dict(requests=0, completed=0, failed=0, shed_queue_full=0, shed_evicted=0,
+                           shed_timeout=0, shed_deadline=0, retries=0, throttled=0, wait_max_sec=0.0)
+
+    # ---------- slots ----------
+    def _acquire(self, priority: int):
+        t0 = time.monotonic()
+        with self._cv:
+            self._stats["requests"] += 1
+            if self._inflight < self.max_inflight and not self._waiting:
+                self._inflight += 1
+                self._record_wait(0.0)
+                return
+            if len(self._waiting) >= self.max_queue:
+                worst = max(self._waiting) if self._waiting else None  # lowest priority, newest
+                if worst is None or worst[0] <= priority:
+                    self._stats["shed_queue_full"] += 1
+                    raise GatewayOverloaded("LLM queue full", retry_after=self.max_wait or 1.0)
+                self._waiting.remove(worst)
+                heapq.heapify(self._waiting)
+                self._evicted.add(worst)
+                self._stats["shed_evicted"] += 1
+                self._cv.notify_all()
+
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            deadline = t0 + self.max_wait
+            # an evicted ticket is no longer queued, so it never satisfies the condition
+            while not (self._inflight < self.max_inflight and self._waiting and self._waiting[0] == ticket):
+                if ticket in self._evicted:
+                    self._evicted.discard(ticket)
+                    raise GatewayOverloaded("LLM queue full (evicted by a higher-priority call)",
+                                            retry_after=self.max_wait or 1.0)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._stats["shed_timeout"] += 1
+                    self._cv.notify_all()  # the head may have changed
+                    raise GatewayOverloaded(f"LLM queue wait exceeded {self.max_wait:g}s",
+                                            retry_after=self.max_wait or 1.0)
+                self._cv.wait(remaining)
+            heapq.heappop(self._waiting)
+            self._inflight += 1
+            self._record_wait(time.monotonic() - t0)
+            self._cv.notify_all()  # next in line may fit into a free slot too
+
+    def _release(self):
+        with self._cv:
+            self._inflight -= 1
+            self._cv.notify_all()
+
+    def _record_wait(self, sec: float):
+        self._waits.append(sec)
+        self._stats["wait_max_sec"] = max(self._stats["wait_max_sec"], sec)
+
+    # ---------- calls ----------
+    def complete(self, payload: dict, priority: int = INTERACTIVE) -> dict:
+        """POST a chat completion payload and return the parsed JSON response."""
+        deadline = time.monotonic() + self.max_call_sec  # covers queueing, attempts and backoff
+        self._acquire(priority)
+        try:
+            for attempt in range(1, self.max_retries+2):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    with self._cv: self._stats["shed_deadline"] += 1
+                    raise GatewayOverloaded(f"LLM call exceeded {self.max_call_sec:g}s")
+                r = self.session.post(self.url, json=payload, timeout=min(self.timeout, remaining))
+                if r.status_code == 200:
+                    with self._cv: self._stats["completed"] += 1
+                    return r.json()
+
+                if r.status_code in RETRY_STATUS and attempt <= self.max_retries:
+                    wait = retry_after_sec(r)
+                    wait = wait if wait is not None else min(MAX_BACKOFF_SEC, 2 ** attempt)
+                    if wait > MAX_BACKOFF_SEC or time.monotonic() + wait >= deadline:
+                        # don't sit on the slot for a retry we can't finish in time
+                        with self._cv: self._stats["shed_deadline"] += 1
+                        raise GatewayOverloaded(f"LLM backend returned {r.status_code}; retry would exceed "
+                                                f"{self.max_call_sec:g}s", retry_after=max(wait, 1.0))
+                    with self._cv:
+                        self._stats["retries"] += 1
+                        if r.status_code == 429: self._stats["throttled"] += 1
+                    eprint(f"[warn] chat HTTP {r.status_code} (attempt {attempt}/{self.max_retries}) → sleep {wait:.1f}s")
+                    time.sleep(wait)
+                    continue
+
+                with self._cv: self._stats["failed"] += 1
+                if r.status_code in RETRY_STATUS:
+                    raise GatewayOverloaded(f"LLM backend still returning {r.status_code} after {self.max_retries} retries",
+                                            retry_after=retry_after_sec(r) or MAX_BACKOFF_SEC)
+                eprint("[error] chat failed:", r.status_code, r.text[:500])
+                r.raise_for_status()
+                raise RuntimeError(f"Chat {r.status_code}: {r.text}")
+        finally:
+            self._release()
+
+    def metrics(self) -> dict:
+        with self._cv:
+            waits = sorted(self._waits)
+            out = dict(self._stats, inflight=self._inflight, queue_depth=len(self._waiting),
+                       max_inflight=self.max_inflight, max_queue=self.max_queue)
+        pct = lambda p: waits[min(len(waits)-1, int(p * len(waits)))] if waits else 0.0
+        out.update(wait_p50_sec=pct(0.50), wait_p95_sec=pct(0.95), wait_p99_sec=pct(0.99))
+        return out
@@ -0,0 +1,16 @@
+# db/pg.py
+# psycopg 3 connections with pgvector's binary adapters registered, so float32
+# numpy arrays are sent as raw bytes (%b placeholders) instead of text literals.
+import psycopg
+from psycopg.types import TypeInfo
+from pgvector.psycopg.vector import register_vector_info
+
+_vector_info = None  # looked up once per process, not once per connection
+
+def connect(**params) -> psycopg.Connection:
+    global _vector_info
+    conn = psycopg.connect(**params)
+    if _vector_info is None:
+        _vector_info = TypeInfo.fetch(conn, "vector")
+    register_vector_info(conn, _vector_info)
+    return conn
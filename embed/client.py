@@ -0,0 +1,113 @@
+# embed/client.py
+# Shared Azure OpenAI embedding client.
+# Requests embeddings as base64 and decodes them straight into float32 arrays;
+# db/pg.py sends those arrays to pgvector in binary, so no per-float Python
+# objects are created on the ingest or query path.
+import os, sys, time, base64
+from email.utils import parsedate_to_datetime
+from typing import List, Optional, Sequence, Union
+import numpy as np
+import requests
+
+DTYPE = np.dtype("<f4")  # Azure returns little-endian float32 for encoding_format=base64
+MAX_RETRIES = 5          # for 429/5xx (ingest default; query paths pass max_retries=0)
+RETRY_BASE_SEC = 2       # exponential backoff base
+RETRY_STATUS = (429, 500, 502, 503, 504)  # shared with app/gateway.py
+
+def eprint(*a, **k): print(*a, file=sys.stderr, **k)
+
+def retry_after_sec(r: requests.Response) -> Optional[float]:
+    """Server-suggested delay from retry-after-ms / Retry-After (seconds or HTTP date)."""
+    ms = r.headers.get("retry-after-ms")
+    if ms:
+        try: return float(ms) / 1000
+        except ValueError: pass
+    ra = r.headers.get("Retry-After")
+    if not ra:
+        return None
+    try:
+        return float(ra)
+    except ValueError:
+        try: return max(0.0, parsedate_to_datetime(ra).timestamp() - time.time())
+        except (TypeError, ValueError): return None
+
+class EmbeddingClient:
+    """Thin wrapper around the Azure embeddings endpoint.
+
+    Config falls back to the usual AZURE_* env vars, read at construction time
+    so callers can run load_dotenv() first. 429/5xx responses are retried up to
+    `max_retries` times, waiting retry-after-ms / Retry-After if sent, else
+    retry_base_sec ** attempt.
+    """
+
+    def __init__(self, endpoint: Optional[str] = None, deployment: Optional[str] = None,
+                 api_key: Optional[str] = None, api_version: Optional[str] = None, timeout: int = 60,
+                 max_retries: int = MAX_RETRIES, retry_base_sec: float = RETRY_BASE_SEC):
+        endpoint   = endpoint   or os.getenv("AZURE_OPENAI_ENDPOINT")
+        deployment = deployment or os.getenv("AZURE_EMBED_DEPLOYMENT")
+        api_key    = api_key    or os.getenv("AZURE_OPENAI_API_KEY")
+        api_version = api_version or os.getenv("AZURE_API_VERSION", "2024-05-01-preview")
+        if not all([endpoint, deployment, api_key]):
+            raise RuntimeError("Missing Azure env vars. Check .env: AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_EMBED_DEPLOYMENT.")
+        self.url = f"{endpoint.rstrip('/')}/openai/deployments/{deployment}/embeddings?api-version={api_version}"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_base_sec = retry_base_sec
+        self.session = requests.Session()  # keep the TLS connection alive between calls
+        self.session.headers.update({"Content-Type": "application/json", "api-key": api_key})
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch; returns a C-contiguous (len(texts), dim) float32 array in input order."""
+        payload = {"input": texts, "encoding_format": "base64"}
+        for attempt in range(1, self.max_retries+2):
+            r = self.session.post(self.url, json=payload, timeout=self.timeout)
+            if r.status_code == 200:
+                return decode_embeddings(r.json()["data"])
+
+            if r.status_code in RETRY_STATUS and attempt <= self.max_retries:
+                wait = retry_after_sec(r)
+                if wait is None:
+                    wait = self.retry_base_sec ** attempt
+                eprint(f"[warn] embeddings HTTP {r.status_code} (attempt {attempt}/{self.max_retries}) → sleep {wait}s")
+                time.sleep(wait)
+                continue
+
+            # hard error (or retries exhausted)
+            eprint("[error] embeddings failed:", r.status_code, r.text[:500])
+            r.raise_for_status()
+            raise RuntimeError(f"Embeddings {r.status_code}: {r.text}")
+
+    def embed_one(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
+
+# ---------- decoding / encoding ----------
+def decode_embeddings(data: Sequence[dict]) -> np.ndarray:
+    """Decode an embeddings `data` list into one contiguous float32 matrix, ordered by `index`.
+
+    Accepts both base64 strings and plain float lists (older API versions ignore encoding_format).
+    """
+    if not data:
+        return np.empty((0, 0), dtype=np.float32)
+    first = as_vector(data[0]["embedding"])
+    out = np.empty((len(data), first.shape[0]), dtype=np.float32)
+    for d in data:
+        out[d["index"]] = as_vector(d["embedding"])
+    return out
+
+def as_vector(e: Union[str, bytes, Sequence[float], np.ndarray]) -> np.ndarray:
+    """Return a float32 vector for a base64 string, raw bytes, list or array."""
+    if isinstance(e, str):
+        e = base64.b64decode(e)
+    if isinstance(e, (bytes, bytearray, memoryview)):
+        return np.frombuffer(e, dtype=DTYPE)
+    return np.asarray(e, dtype=np.float32)
+
+def to_b64(v: np.ndarray) -> str:
+    """Encode a vector as base64 float32 (same format the API returns)."""
+    return base64.b64encode(np.ascontiguousarray(v, dtype=DTYPE).tobytes()).decode("ascii")
+
+def cosine_scores(q: np.ndarray, m: np.ndarray) -> np.ndarray:
+    """Cosine similarity of query vector q against every row of matrix m."""
+    q = np.asarray(q, dtype=np.float32)
+    m = np.asarray(m, dtype=np.float32)
+    return (m @ q) / (np.linalg.norm(m, axis=1) * np.linalg.norm(q) + 1e-12)
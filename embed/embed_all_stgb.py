@@ -1,26 +1,22 @@
 # save as embed_all_stgb.py and run:
 #   python embed_all_stgb.py --input data/interim/stgb_sections.ndjson --out data/processed/stgb_sections_with_vecs.ndjson
 
-import os, json, math, time, argparse, sys
+import os, json, argparse, sys
 from pathlib import Path
 from typing import List, Dict, Any
 from dotenv import load_dotenv
-import requests
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from embed.client import EmbeddingClient, as_vector, to_b64, cosine_scores
 
 # ---------- config ----------
 BATCH_SIZE = 64          # safe batch for embeddings
-MAX_RETRIES = 5          # for 429/5xx
-RETRY_BASE_SEC = 2       # exponential backoff base
 
 # ---------- utils ----------
 def eprint(*a, **k): print(*a, file=sys.stderr, **k)
 
-def cosine(a: List[float], b: List[float]) -> float:
-    dot = sum(x*y for x, y in zip(a, b))
-    na = math.sqrt(sum(x*x for x in a))
-    nb = math.sqrt(sum(y*y for y in b))
-    return dot / (na*nb + 1e-12)
-
 def load_ndjson(path: Path) -> List[Dict[str, Any]]:
     rows = []
     with path.open("r", encoding="utf-8") as f:
@@ -35,31 +31,6 @@ def save_ndjson(path: Path, rows: List[Dict[str, Any]]):
         for r in rows:
             f.write(json.dumps(r, ensure_ascii=False) + "\n")
 
-def call_azure_embeddings(texts: List[str], endpoint: str, deployment: str, api_key: str, api_version: str) -> List[List[float]]:
-    url = f"{endpoint}/openai/deployments/{deployment}/embeddings?api-version={api_version}"
-    headers = {"Content-Type": "application/json", "api-key": api_key}
-    payload = {"input": texts}
-
-    for attempt in range(1, MAX_RETRIES+1):
-        r = requests.post(url, headers=headers, json=payload, timeout=60)
-        if r.status_code == 200:
-            data = r.json()["data"]
-            # sort by index to preserve order
-            data_sorted = sorted(data, key=lambda d: d["index"])
-            return [d["embedding"] for d in data_sorted]
-
-        if r.status_code in (429, 500, 502, 503, 504):
-            wait = RETRY_BASE_SEC ** attempt
-            eprint(f"[warn] embeddings HTTP {r.status_code} (attempt {attempt}/{MAX_RETRIES}) → sleep {wait}s")
-            time.sleep(wait)
-            continue
-
-        # hard error
-        eprint("[error] embeddings failed:", r.status_code, r.text[:500])
-        r.raise_for_status()
-
-    raise RuntimeError(f"Failed after {MAX_RETRIES} retries")
-
 # ---------- main ----------
 def main():
     load_dotenv()  # expects .env in project root
@@ -70,10 +41,11 @@ def main():
 
     if not all([endpoint, api_key, deployment]):
         raise RuntimeError("Missing Azure env vars. Check .env: AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_EMBED_DEPLOYMENT.")
+    client = EmbeddingClient(endpoint, deployment, api_key, api_ver)
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", required=True, help="path to NDJSON with sections")
-    parser.add_argument("--out", required=True, help="output NDJSON (will include an 'embedding' field)")
+    parser.add_argument("--out", required=True, help="output NDJSON (will include an 'embedding' field, base64 float32)")
     parser.add_argument("--resume", action="store_true", help="resume if output exists (skip already embedded)")
     args = parser.parse_args()
 
@@ -116,16 +88,16 @@ def main():
             continue
 
         texts = [r["full_text"] for r in todo]
-        embs = call_azure_embeddings(texts, endpoint, deployment, api_key, api_ver)
+        embs = client.embed(texts)  # (len(todo), dim) float32
 
-        if dim is None and embs:
-            dim = len(embs[0])
+        if dim is None and len(embs):
+            dim = embs.shape[1]
             eprint(f"[ok] embedding dim = {dim}")
 
         # attach embeddings
         for r, e in zip(todo, embs):
             r_out = dict(r)
-            r_out["embedding"] = e
+            r_out["embedding"] = to_b64(e)
             out_rows.append(r_out)
 
         eprint(f"[ok] embedded {len(todo)} rows ({i+len(batch)}/{len(rows)})")
@@ -138,16 +110,16 @@ def main():
     try:
         q = "Wie lang ist die Kündigungsfrist bei einem Arbeitsverhältnis?"
         eprint(f"[test] query: {q}")
-        q_emb = call_azure_embeddings([q], endpoint, deployment, api_key, api_ver)[0]
-        # score all
-        scored = []
-        for r in out_rows:
-            scored.append((cosine(q_emb, r["embedding"]), r))
-        scored.sort(key=lambda x: x[0], reverse=True)
+        q_emb = client.embed_one(q)
+        # score all in one matrix product (resumed rows may still hold float lists)
+        mat = np.stack([as_vector(r["embedding"]) for r in out_rows])
+        scores = cosine_scores(q_emb, mat)
+        top = np.argsort(-scores)[:5]
 
         print("\nTop-Ergebnisse:")
-        for score, r in scored[:5]:
-            print(f"  score={score:.3f} | § {r['section_number']} {r['section_title']}")
+        for i in top:
+            r = out_rows[i]
+            print(f"  score={scores[i]:.3f} | § {r['section_number']} {r['section_title']}")
     except Exception as ex:
         eprint(f"[warn] test query failed: {ex}")
 
@@ -1,9 +1,12 @@
 # embed/insert_chunks.py
-import os, json, time
+import os, sys, json, time
 from pathlib import Path
 from dotenv import load_dotenv
-import psycopg2
-from psycopg2.extras import execute_values
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from embed.client import as_vector
+from db.pg import connect
+from embed.section_store import STORE_PATH, build_from_db
 
 # Load .env explicitly from project root
 load_dotenv(Path("/home/noe/Desktop/Ai_Legal research_assistant/.env"))
@@ -13,11 +16,8 @@ LAW_ABBR  = "StGB"
 SOURCE_URI= "BJNR001270871.xml"
 BATCH     = 100  # tune 50–200
 
-def vec_str(v):  # pgvector-compatible string
-    return "[" + ",".join(f"{x:.7f}" for x in v) + "]"
-
 def main(limit=0):
-    conn = psycopg2.connect(
+    conn = connect(
         host=os.getenv("PGHOST"),
         port=os.getenv("PGPORT", "5432"),
         dbname=os.getenv("PGDATABASE"),
@@ -69,7 +69,7 @@ def main(limit=0):
                 continue
             title = r.get("section_title", "")
             text = r["full_text"]
-            emb  = vec_str(r["embedding"])
+            emb  = as_vector(r["embedding"])  # base64 float32 (or legacy float list) → float32 array
             to_insert.append((doc_id, sec, title, text, emb))
             total += 1
 
@@ -87,19 +87,22 @@ def main(limit=0):
         print(f"[progress] final total added this run: {total}")
 
     cur.close()
+
+    # Rebuild the memory-mapped section store the API/query code reads texts from
+    n = build_from_db(conn)
+    print(f"[store] wrote {n} sections to {STORE_PATH}")
     conn.close()
     dur = time.time() - start
     print(f"[done] inserted {total} new rows in {dur:.1f}s")
 
 def _flush(cur, rows):
-    # Bulk insert with server-side cast to ::vector
-    template = "(%s, %s, %s, %s, %s::vector)"
-    execute_values(cur, """
+    # Bulk insert (pipelined by psycopg); embeddings go over the wire as binary vectors
+    cur.executemany("""
         INSERT INTO legal.chunks
           (document_id, section_number, section_title, full_text, embedding)
-        VALUES %s
+        VALUES (%s, %s, %s, %s, %b)
         ON CONFLICT (document_id, section_number) DO NOTHING
-    """, rows, template=template, page_size=len(rows))
+    """, rows)
 
 if __name__ == "__main__":
     # limit=0 → load ALL; you can safely re-run to resume
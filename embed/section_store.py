@@ -0,0 +1,185 @@
+# embed/section_store.py
+# Read-only, memory-mapped store of section texts keyed by legal.chunks.id.
+# Rebuilt at ingest time (insert_chunks.py, or run this file directly). Every
+# uvicorn worker maps the same file, so the corpus lives once in the page cache
+# instead of once per process, and the ANN query only has to return ids.
+#
+# File layout (little-endian):
+#   magic "LRSECT01" | u64 count | count x INDEX_DTYPE (sorted by id) | blob
+# each blob entry is section_number + section_title + full_text (UTF-8, back to back).
+import os, sys, mmap
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+STORE_PATH = Path(os.getenv("SECTION_STORE", ROOT / "data" / "processed" / "sections.store"))
+
+MAGIC = b"LRSECT01"
+HEADER_SIZE = 16
+INDEX_DTYPE = np.dtype([("id", "<i8"), ("off", "<i8"),
+                        ("num_len", "<u4"), ("title_len", "<u4"), ("text_len", "<u4"), ("_pad", "<u4")])
+
+class Section:
+    """One § of a law; `text` is only decoded (or fetched) when first accessed."""
+    __slots__ = ("id", "section_number", "section_title", "_text", "_load")
+
+    def __init__(self, id: int, section_number: str, section_title: str,
+                 load: Callable[[int], Optional[str]]):
+        self.id = id
+        self.section_number = section_number
+        self.section_title = section_title or ""
+        self._text = None
+        self._load = load
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self._load(self.id) or ""
+        return self._text
+
+class SectionStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            st = os.fstat(f.fileno())
+            self.ident = (st.st_dev, st.st_ino, st.st_mtime_ns)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:8] != MAGIC:
+            raise RuntimeError(f"{self.path} is not a section store")
+        n = int(np.frombuffer(self._mm, dtype="<u8", count=1, offset=8)[0])
+        self._index = np.frombuffer(self._mm, dtype=INDEX_DTYPE, count=n, offset=HEADER_SIZE)
+        self._ids = self._index["id"]
+        self._blob = HEADER_SIZE + n * INDEX_DTYPE.itemsize
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _entry(self, id: int):
+        pos = int(np.searchsorted(self._ids, id))
+        if pos < len(self._ids) and self._ids[pos] == id:
+            return self._index[pos]
+        return None
+
+    def _read(self, start: int, length: int) -> str:
+        return self._mm[start:start+length].decode("utf-8")
+
+    def get(self, id: int) -> Optional[Section]:
+        """Section header (number/title) for id; text stays in the mapping until accessed."""
+        e = self._entry(id)
+        if e is None:
+            return None
+        start = self._blob + int(e["off"])
+        num = self._read(start, int(e["num_len"]))
+        title = self._read(start + int(e["num_len"]), int(e["title_len"]))
+        return Section(id, num, title, self.text)
+
+    def text(self, id: int) -> Optional[str]:
+        e = self._entry(id)
+        if e is None:
+            return None
+        start = self._blob + int(e["off"]) + int(e["num_len"]) + int(e["title_len"])
+        return self._read(start, int(e["text_len"]))
+
+# ---------- per-process handle ----------
+_store: Optional[SectionStore] = None
+
+def open_store(path: Optional[Path] = None) -> Optional[SectionStore]:
+    """Shared read-only store, reopened when ingest has replaced the file; None if not built yet."""
+    global _store
+    path = Path(path or STORE_PATH)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if _store is None or _store.path != path or _store.ident != (st.st_dev, st.st_ino, st.st_mtime_ns):
+        _store = SectionStore(path)
+    return _store
+
+class _DbTexts:
+    """Text loader for store misses: one query for all of them, on first access."""
+    def __init__(self, cur, ids: List[int]):
+        self.cur, self.ids, self.texts = cur, ids, None
+
+    def __call__(self, id: int) -> Optional[str]:
+        if self.texts is None:
+            self.cur.execute("SELECT id, full_text FROM legal.chunks WHERE id = ANY(%s);", (self.ids,))
+            self.texts = dict(self.cur.fetchall())
+        return self.texts.get(id)
+
+def load_sections(ids: List[int], cur) -> Dict[int, Section]:
+    """Resolve ids via the store; misses get their headers from legal.chunks in one query.
+
+    Texts of missed sections are fetched through `cur` (all in one query) only when
+    the first of them is accessed, so the cursor must stay open until the caller
+    has built its context.
+    """
+    store = open_store()
+    found: Dict[int, Section] = {}
+    missing = []
+    for i in ids:
+        s = store.get(i) if store is not None else None
+        if s is None:
+            missing.append(i)
+        else:
+            found[i] = s
+    if missing:
+        cur.execute("""
+            SELECT id, section_number, section_title
+            FROM legal.chunks WHERE id = ANY(%s);
+        """, (missing,))
+        load = _DbTexts(cur, missing)
+        for r in cur.fetchall():
+            found[r[0]] = Section(r[0], r[1], r[2], load)
+    return found
+
+# ---------- build ----------
+def build_store(rows: Iterable[Tuple[int, str, str, str]], path: Path = STORE_PATH) -> int:
+    """Write (id, section_number, section_title, full_text) rows to a new store file.
+
+    Written to a temp file and swapped in with os.replace, so running workers keep
+    reading their old mapping until they notice the new file.
+    """
+    rows = sorted(rows, key=lambda r: r[0])
+    index = np.zeros(len(rows), dtype=INDEX_DTYPE)
+    parts, off = [], 0
+    for i, (id, num, title, text) in enumerate(rows):
+        b = [(num or "").encode("utf-8"), (title or "").encode("utf-8"), (text or "").encode("utf-8")]
+        index[i] = (id, off, len(b[0]), len(b[1]), len(b[2]), 0)
+        parts.extend(b)
+        off += sum(len(x) for x in b)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(MAGIC)
+        f.write(np.array([len(rows)], dtype="<u8").tobytes())
+        f.write(index.tobytes())
+        for p in parts:
+            f.write(p)
+    os.replace(tmp, path)
+    return len(rows)
+
+def build_from_db(conn, path: Path = STORE_PATH) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT id, section_number, section_title, full_text FROM legal.chunks;")
+        rows = cur.fetchall()
+    return build_store(rows, path)
+
+if __name__ == "__main__":
+    # rebuild the store from the current DB contents
+    import psycopg
+    from dotenv import load_dotenv
+    load_dotenv(ROOT / ".env")
+    conn = psycopg.connect(
+        host=os.getenv("PGHOST"),
+        port=os.getenv("PGPORT", "5432"),
+        dbname=os.getenv("PGDATABASE"),
+        user=os.getenv("PGUSER"),
+        password=os.getenv("PGPASSWORD"),
+        sslmode=os.getenv("PGSSLMODE", "require"),
+    )
+    n = build_from_db(conn)
+    conn.close()
+    print(f"[done] wrote {n} sections to {STORE_PATH}", file=sys.stderr)
@@ -1,8 +1,11 @@
 # embed/test_embed_20.py
-import os, json, math
+import os, sys, json
 from pathlib import Path
 from dotenv import load_dotenv
-import requests
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from embed.client import EmbeddingClient, cosine_scores
 
 load_dotenv(Path("/home/noe/Desktop/Ai_Legal research_assistant/.env"))
 
@@ -15,27 +18,15 @@ API_KEY    = os.environ["AZURE_OPENAI_API_KEY"]
 DEPLOYMENT = os.environ["AZURE_EMBED_DEPLOYMENT"]
 API_VER    = os.getenv("AZURE_API_VERSION", "2024-05-01-preview")
 
+CLIENT = EmbeddingClient(ENDPOINT, DEPLOYMENT, API_KEY, API_VER)
+
 def embed_texts(texts):
-    url = f"{ENDPOINT}/openai/deployments/{DEPLOYMENT}/embeddings?api-version={API_VER}"
-    headers = {"Content-Type":"application/json", "api-key": API_KEY}
-    payload = {"input": texts}
-    r = requests.post(url, headers=headers, json=payload, timeout=60)
-    r.raise_for_status()
-    data = r.json()["data"]
-    # preserve original order by index
-    data_sorted = sorted(data, key=lambda d: d["index"])
-    embs = [d["embedding"] for d in data_sorted]
+    # (len(texts), dim) float32, already in input order
+    embs = CLIENT.embed(texts)
     # quick sanity
-    dim = len(embs[0])
-    print(f"[OK] Received {len(embs)} embeddings with dim={dim}")
+    print(f"[OK] Received {embs.shape[0]} embeddings with dim={embs.shape[1]}")
     return embs
 
-def cosine_sim(a, b):
-    dot = sum(x*y for x,y in zip(a,b))
-    na = math.sqrt(sum(x*x for x in a))
-    nb = math.sqrt(sum(y*y for y in b))
-    return dot / (na * nb + 1e-12)
-
 def main():
     # 1) load 20 sections
     rows = []
@@ -54,14 +45,12 @@ def main():
     q_emb = embed_texts([query])[0]
 
     # 4) score & print top-k
-    scored = []
-    for r, e in zip(rows, section_embs):
-        scored.append((cosine_sim(q_emb, e), r))
-    scored.sort(reverse=True, key=lambda x: x[0])
+    scores = cosine_scores(q_emb, section_embs)
 
     print("\nTop-Ergebnisse:")
-    for score, r in scored[:K]:
-        print(f"  score={score:.3f} | § {r['section_number']} {r['section_title']}")
+    for i in np.argsort(-scores)[:K]:
+        r = rows[i]
+        print(f"  score={scores[i]:.3f} | § {r['section_number']} {r['section_title']}")
 
 if __name__ == "__main__":
     main()
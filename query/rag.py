@@ -1,10 +1,15 @@
 # rag/answer.py
-import os, psycopg2, requests, textwrap
+import os, sys, textwrap
 from pathlib import Path
 from dotenv import load_dotenv
 
 ROOT = Path(__file__).resolve().parents[1]
 load_dotenv(ROOT / ".env")
+sys.path.insert(0, str(ROOT))
+from embed.client import EmbeddingClient
+from db.pg import connect
+from embed.section_store import load_sections
+from app.gateway import ChatGateway, BATCH
 
 # ----- Azure config -----
 AOAI_ENDPOINT = os.environ["AZURE_OPENAI_ENDPOINT"].rstrip("/")
@@ -23,43 +28,35 @@ DB = dict(
     sslmode=os.getenv("PGSSLMODE", "require"),
 )
 
-def embed(text: str):
-    url = f"{AOAI_ENDPOINT}/openai/deployments/{EMB_DEPLOY}/embeddings?api-version={API_VER}"
-    r = requests.post(url,
-                      headers={"api-key": AOAI_API_KEY, "Content-Type": "application/json"},
-                      json={"input": [text]}, timeout=60)
-    if r.status_code != 200:
-        raise RuntimeError(f"Embeddings {r.status_code}: {r.text}")
-    return r.json()["data"][0]["embedding"]
+EMBEDDER = EmbeddingClient(AOAI_ENDPOINT, EMB_DEPLOY, AOAI_API_KEY, API_VER, max_retries=1)
+LLM      = ChatGateway(AOAI_ENDPOINT, CHAT_DEPLOY, AOAI_API_KEY, API_VER)  # this process only
 
-def vec_str(v):  # pgvector literal
-    return "[" + ",".join(f"{x:.7f}" for x in v) + "]"
+def embed(text: str):
+    return EMBEDDER.embed_one(text)  # float32 vector
 
-def retrieve(query: str, k: int = 8, law="StGB"):
-    qvec = vec_str(embed(query))
-    conn = psycopg2.connect(**DB)
-    with conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT c.section_number, c.section_title, c.full_text,
-                   1 - (c.embedding <=> %s::vector) AS similarity
-            FROM legal.chunks c
-            JOIN legal.documents d ON d.id = c.document_id
-            WHERE d.law_abbr = %s
-            ORDER BY c.embedding <=> %s::vector
-            LIMIT %s;
-            """,
-            (qvec, law, qvec, k)
-        )
-        rows = cur.fetchall()
-    conn.close()
+def retrieve(cur, query: str, k: int = 8, law="StGB"):
+    qvec = embed(query)  # float32 array, sent to pgvector in binary
+    # ids + scores only; texts are read from the section store when needed
+    cur.execute(
+        """
+        SELECT c.id, 1 - (c.embedding <=> %b::vector) AS similarity
+        FROM legal.chunks c
+        JOIN legal.documents d ON d.id = c.document_id
+        WHERE d.law_abbr = %s
+        ORDER BY c.embedding <=> %b::vector
+        LIMIT %s;
+        """,
+        (qvec, law, qvec, k)
+    )
+    rows = cur.fetchall()
+    secs = load_sections([r[0] for r in rows], cur)
     # shape into small dicts
     docs = [{
-        "sec": r[0],
-        "title": r[1] or "",
-        "text": r[2],
-        "sim": float(r[3]),
-    } for r in rows]
+        "sec": secs[r[0]].section_number,
+        "title": secs[r[0]].section_title,
+        "section": secs[r[0]],
+        "sim": float(r[1]),
+    } for r in rows if r[0] in secs]
     return docs
 
 def build_context(docs, max_chars=8000):
@@ -67,7 +64,7 @@ def build_context(docs, max_chars=8000):
     parts, used = [], 0
     for d in docs:
         header = f"§ {d['sec']} {d['title']}".strip()
-        body   = d["text"]
+        body   = d["section"].text  # lazy: only sections that reach the context are read
         snippet = textwrap.shorten(" ".join(body.split()), width=1200, placeholder=" …")
         chunk = f"{header}\n{snippet}"
         if used + len(chunk) > max_chars:
@@ -76,8 +73,7 @@ def build_context(docs, max_chars=8000):
         used += len(chunk)
     return "\n\n---\n\n".join(parts)
 
-def ask_llm(question: str, context: str):
-    url = f"{AOAI_ENDPOINT}/openai/deployments/{CHAT_DEPLOY}/chat/completions?api-version={API_VER}"
+def ask_llm(question: str, context: str, priority: int = BATCH):
     system = (
         "Du bist ein vorsichtiger juristischer Assistent (DE). "
         "Antworte präzise in Deutsch und zitiere immer die relevanten Paragraphen "
@@ -98,16 +94,15 @@ def ask_llm(question: str, context: str):
         "temperature": 0.2,
         "max_tokens": 450,
     }
-    r = requests.post(url,
-                      headers={"api-key": AOAI_API_KEY, "Content-Type": "application/json"},
-                      json=payload, timeout=120)
-    if r.status_code != 200:
-        raise RuntimeError(f"Chat {r.status_code}: {r.text}")
-    return r.json()["choices[0]"]["message"]["content"] if "choices[0]" in r.text else r.json()["choices"][0]["message"]["content"]
+    data = LLM.complete(payload, priority=priority)
+    return data["choices"][0]["message"]["content"]
 
 def answer(question: str, k=8):
-    docs = retrieve(question, k=k, law="StGB")
-    ctx  = build_context(docs)
+    conn = connect(**DB)
+    with conn, conn.cursor() as cur:
+        docs = retrieve(cur, question, k=k, law="StGB")
+        ctx  = build_context(docs)  # store misses read their text through cur
+    conn.close()
     out  = ask_llm(question, ctx)
     # Show quick citations list for debugging
     cites = [f"§ {d['sec']} {d['title']}" for d in docs[:k]]
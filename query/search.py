@@ -1,10 +1,12 @@
 # query/search.py
-import os
-import psycopg2
-import requests
+import os, sys
 from pathlib import Path
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from embed.client import EmbeddingClient
+from db.pg import connect
+
 # load .env from project root
 load_dotenv(Path("/home/noe/Desktop/Ai_Legal research_assistant/.env"))
 
@@ -14,20 +16,15 @@ API_KEY    = os.environ["AZURE_OPENAI_API_KEY"]
 DEPLOYMENT = os.environ["AZURE_EMBED_DEPLOYMENT"]  # your embedding deployment name
 API_VER    = os.getenv("AZURE_API_VERSION", "2024-05-01-preview")
 
-def embed(text: str):
-    url = f"{ENDPOINT}/openai/deployments/{DEPLOYMENT}/embeddings?api-version={API_VER}"
-    r = requests.post(url, headers={"api-key": API_KEY, "Content-Type": "application/json"},
-                      json={"input": [text]}, timeout=60)
-    r.raise_for_status()
-    return r.json()["data"][0]["embedding"]
+CLIENT = EmbeddingClient(ENDPOINT, DEPLOYMENT, API_KEY, API_VER, max_retries=1)
 
-def vec_str(v):
-    return "[" + ",".join(f"{x:.7f}" for x in v) + "]"
+def embed(text: str):
+    return CLIENT.embed_one(text)  # float32 vector
 
 def search(query: str, k: int = 5):
-    qvec = vec_str(embed(query))
+    qvec = embed(query)  # float32 array, sent to pgvector in binary
 
-    conn = psycopg2.connect(
+    conn = connect(
         host=os.getenv("PGHOST"),
         port=os.getenv("PGPORT", "5432"),
         dbname=os.getenv("PGDATABASE"),
@@ -42,12 +39,12 @@ def search(query: str, k: int = 5):
                 """
                 SELECT c.section_number,
                     c.section_title,
-                    1 - (c.embedding <=> %s::vector) AS similarity
+                    1 - (c.embedding <=> %b::vector) AS similarity
                 FROM legal.chunks c
                 JOIN legal.documents d ON d.id = c.document_id
                 WHERE d.law_abbr = 'StGB'
                 ORDER BY
-                    (c.embedding <=> %s::vector)
+                    (c.embedding <=> %b::vector)
                 + CASE
                         WHEN lower(c.section_title) LIKE %s THEN -0.02
                         WHEN lower(c.full_text)     LIKE %s THEN -0.02
@@ -0,0 +1,6 @@
+# tests/conftest.py
+# Make the top-level script packages (app/, db/, embed/, query/) importable.
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,95 @@
+# tests/test_embed_client.py
+import base64
+from email.utils import formatdate
+import time
+import numpy as np
+import pytest
+from embed.client import EmbeddingClient, decode_embeddings, as_vector, to_b64, retry_after_sec
+
+def rand(n, dim=1536):
+    return np.random.default_rng(0).random((n, dim), dtype=np.float32)
+
+def test_b64_round_trip():
+    v = rand(1)[0]
+    assert np.array_equal(as_vector(to_b64(v)), v)
+    # same wire format the API uses: little-endian float32
+    assert base64.b64decode(to_b64(v)) == v.astype("<f4").tobytes()
+
+def test_decode_reorders_by_index():
+    m = rand(3)
+    data = [{"index": i, "embedding": to_b64(m[i])} for i in (2, 0, 1)]
+    assert np.array_equal(decode_embeddings(data), m)
+
+def test_decode_accepts_float_lists():
+    m = rand(2, 8)
+    data = [{"index": 1, "embedding": m[1].tolist()}, {"index": 0, "embedding": to_b64(m[0])}]
+    assert np.array_equal(decode_embeddings(data), m)
+
+def test_decode_is_contiguous_float32():
+    out = decode_embeddings([{"index": i, "embedding": to_b64(v)} for i, v in enumerate(rand(4))])
+    assert out.dtype == np.float32 and out.shape == (4, 1536)
+    assert out.flags["C_CONTIGUOUS"]
+    assert decode_embeddings([]).shape == (0, 0)
+
+class Resp:
+    def __init__(self, status_code=200, headers=None, data=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+        self.data = data
+
+    def json(self):
+        return {"data": self.data}
+
+    def raise_for_status(self):
+        raise RuntimeError(self.status_code)
+
+class Session:
+    """Stub for requests.Session: replays `responses` in order."""
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.payloads = []
+
+    def post(self, url, json, timeout):
+        self.payloads.append(json)
+        return self.responses.pop(0)
+
+def client(responses, **kw):
+    c = EmbeddingClient("https://example.invalid", "emb", "key", **kw)
+    c.session = Session(responses)
+    return c
+
+OK = Resp(200, data=[{"index": 0, "embedding": to_b64(np.ones(4, dtype=np.float32))}])
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"Retry-After": "3"}, 3.0),
+    ({"retry-after-ms": "250"}, 0.25),
+    ({}, 2.0),  # no header: retry_base_sec ** attempt
+])
+def test_retry_waits(headers, expected, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("embed.client.time.sleep", sleeps.append)
+    c = client([Resp(429, headers), OK], max_retries=2)
+    assert np.array_equal(c.embed_one("x"), np.ones(4, dtype=np.float32))
+    assert sleeps == [pytest.approx(expected)]
+    assert c.session.payloads[0]["encoding_format"] == "base64"
+
+def test_no_retries_fails_fast(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("embed.client.time.sleep", sleeps.append)
+    c = client([Resp(429, {"Retry-After": "3"})], max_retries=0)
+    with pytest.raises(RuntimeError):
+        c.embed(["x"])
+    assert sleeps == []
+
+def test_retries_exhausted(monkeypatch):
+    monkeypatch.setattr("embed.client.time.sleep", lambda s: None)
+    c = client([Resp(503), Resp(503), Resp(503)], max_retries=2)
+    with pytest.raises(RuntimeError):
+        c.embed(["x"])
+    assert c.session.responses == []
+
+def test_retry_after_http_date():
+    r = Resp(429, {"Retry-After": formatdate(time.time() + 30, usegmt=True)})
+    assert 25 <= retry_after_sec(r) <= 30
+    assert retry_after_sec(Resp(429, {"Retry-After": "soon"})) is None
@@ -0,0 +1,182 @@
+# tests/test_gateway.py
+import importlib, threading, time
+import pytest
+from app.gateway import ChatGateway, GatewayOverloaded, INTERACTIVE, BATCH
+
+OK = {"choices": [{"message": {"content": "ok"}}]}
+
+class Resp:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+
+    def json(self):
+        return OK
+
+    def raise_for_status(self):
+        raise RuntimeError(self.status_code)
+
+class Session:
+    """Stub for requests.Session: replays `responses`, then answers 200.
+
+    With a `gate`, every post blocks until the test sets it, so the running call
+    keeps its slot for as long as the test needs without relying on timing.
+    """
+    def __init__(self, responses=(), gate=None):
+        self.responses = list(responses)
+        self.gate = gate
+        self.calls = []
+
+    def post(self, url, json, timeout):
+        self.calls.append(json.get("tag"))
+        if self.gate is not None:
+            assert self.gate.wait(5)
+        return self.responses.pop(0) if self.responses else Resp()
+
+def gateway(session, **kw):
+    g = ChatGateway("https://example.invalid", "chat", "key", **kw)
+    g.session = session
+    return g
+
+def wait_for(g, **expected):
+    """Poll g.metrics() until every expected value is reached (or fail after 5s)."""
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        m = g.metrics()
+        if all(m[k] == v for k, v in expected.items()):
+            return
+        time.sleep(0.001)
+    raise AssertionError(f"metrics never reached {expected}: {g.metrics()}")
+
+def run(g, results, tag, priority):
+    try:
+        g.complete({"tag": tag}, priority=priority)
+        results.append(tag)
+    except GatewayOverloaded:
+        results.append("shed-" + tag)
+
+def start_all(g, calls):
+    """Start calls in order, each once the previous one is running, queued or shed."""
+    results, threads = [], []
+    base = g.metrics()["requests"]
+    for tag, prio in calls:
+        t = threading.Thread(target=run, args=(g, results, tag, prio))
+        t.start()
+        threads.append(t)
+        # `requests` is bumped under the same lock hold that runs, queues or sheds the call
+        wait_for(g, requests=base + len(threads))
+    return results, threads
+
+def test_priority_order():
+    gate = threading.Event()
+    s = Session(gate=gate)
+    g = gateway(s, max_inflight=1, max_queue=5, max_wait=5)
+    results, threads = start_all(g, [("a", BATCH), ("b", BATCH), ("c", BATCH), ("i", INTERACTIVE)])
+    wait_for(g, inflight=1, queue_depth=3)
+    gate.set()
+    for t in threads: t.join()
+    assert s.calls == ["a", "i", "b", "c"]
+    assert g.metrics()["queue_depth"] == 0 and g.metrics()["inflight"] == 0
+
+def test_queue_full_sheds_same_priority():
+    gate = threading.Event()
+    s = Session(gate=gate)
+    g = gateway(s, max_inflight=1, max_queue=2, max_wait=5)
+    results, threads = start_all(g, [("a", INTERACTIVE), ("b", INTERACTIVE), ("c", INTERACTIVE)])
+    wait_for(g, inflight=1, queue_depth=2)
+    with pytest.raises(GatewayOverloaded):
+        g.complete({"tag": "d"}, priority=INTERACTIVE)
+    gate.set()
+    for t in threads: t.join()
+    assert s.calls == ["a", "b", "c"]
+    assert g.metrics()["shed_queue_full"] == 1
+
+def test_queue_full_evicts_worst_for_interactive():
+    gate = threading.Event()
+    s = Session(gate=gate)
+    g = gateway(s, max_inflight=1, max_queue=3, max_wait=5)
+    results, threads = start_all(g, [("a", BATCH), ("b", BATCH), ("c", BATCH), ("d", BATCH)])
+    wait_for(g, inflight=1, queue_depth=3)
+    results2, threads2 = start_all(g, [("e", INTERACTIVE)])
+    threads[3].join()  # the newest batch waiter makes room
+    gate.set()
+    for t in threads + threads2: t.join()
+    # the interactive call runs next
+    assert s.calls == ["a", "e", "b", "c"]
+    assert "shed-d" in results and results2 == ["e"]
+    assert g.metrics()["shed_evicted"] == 1
+
+def test_evicted_waiter_after_queue_drained():
+    # Force the interleaving where a waiter is evicted and, before it gets the
+    # lock back, the running call and its evictor have both finished.
+    g = gateway(Session(), max_inflight=1, max_queue=1, max_wait=5)
+    with g._cv:
+        g._inflight = 1  # a call is running
+    results, threads = start_all(g, [("b", BATCH)])
+    wait_for(g, queue_depth=1)
+    with g._cv:  # b is parked in wait() and can't look until we let go
+        ticket = g._waiting.pop()
+        g._evicted.add(ticket)
+        g._inflight = 0  # queue empty, slot free
+        g._cv.notify_all()
+    threads[0].join(5)
+    assert results == ["shed-b"]
+    assert not g._evicted and g.metrics()["inflight"] == 0
+
+def test_queue_wait_timeout():
+    gate = threading.Event()
+    s = Session(gate=gate)
+    g = gateway(s, max_inflight=1, max_queue=5, max_wait=0.05)
+    results, threads = start_all(g, [("a", INTERACTIVE)])
+    wait_for(g, inflight=1)
+    with pytest.raises(GatewayOverloaded):
+        g.complete({"tag": "b"})
+    gate.set()
+    for t in threads: t.join()
+    m = g.metrics()
+    assert m["shed_timeout"] == 1 and m["queue_depth"] == 0
+    assert s.calls == ["a"]
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"Retry-After": "0.2"}, 0.2),
+    ({"retry-after-ms": "150"}, 0.15),
+])
+def test_retry_after_honoured(headers, expected, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("app.gateway.time.sleep", sleeps.append)
+    s = Session([Resp(429, headers), Resp(429, headers)])
+    g = gateway(s, max_retries=4)
+    assert g.complete({"tag": "x"}) == OK
+    assert sleeps == [pytest.approx(expected)] * 2
+    assert g.metrics()["throttled"] == 2
+
+def test_retry_after_past_deadline_sheds_without_sleeping(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("app.gateway.time.sleep", sleeps.append)
+    s = Session([Resp(429, {"Retry-After": "20"})])
+    g = gateway(s, max_retries=4, max_call_sec=5)
+    with pytest.raises(GatewayOverloaded) as ex:
+        g.complete({"tag": "x"})
+    assert sleeps == [] and ex.value.retry_after == 20
+    assert g.metrics()["inflight"] == 0 and g.metrics()["shed_deadline"] == 1
+
+class FakeConn:
+    def __enter__(self): return self
+    def __exit__(self, *a): return False
+    def cursor(self): return self
+    def close(self): pass
+
+def test_ask_maps_overload_to_503(monkeypatch):
+    from fastapi.testclient import TestClient
+    for k in ("AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_API_KEY", "AZURE_EMBED_DEPLOYMENT", "AZURE_CHAT_DEPLOYMENT"):
+        monkeypatch.setenv(k, "https://example.invalid" if k == "AZURE_OPENAI_ENDPOINT" else "x")
+    api = importlib.import_module("app.api")
+    monkeypatch.setattr(api, "connect", lambda **kw: FakeConn())
+    monkeypatch.setattr(api, "retrieve", lambda cur, q, k, law: [])
+    monkeypatch.setattr(api.LLM, "session", Session([Resp(429, {"Retry-After": "120"})]))
+
+    r = TestClient(api.app).post("/ask", json={"question": "Was regelt § 242?"})
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "120"  # server's value, passed through instead of sleeping
+    assert TestClient(api.app).get("/metrics/llm").json()["shed_deadline"] == 1
@@ -0,0 +1,87 @@
+# tests/test_section_store.py
+import os
+from embed.section_store import build_store, open_store, load_sections, SectionStore
+
+ROWS = [
+    (42, "242", "Diebstahl", "(1) Wer eine fremde bewegliche Sache … wegnimmt, wird bestraft."),
+    (7, "1", None, "Eine Tat kann nur bestraft werden, wenn die Strafbarkeit gesetzlich bestimmt war."),
+    (13, "13a", "", "Überschrift leer – Umlaute äöüß und ein Emoji 😀"),
+]
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "sections.store"
+    assert build_store(ROWS, path) == 3
+    store = open_store(path)
+    assert len(store) == 3
+    for id, num, title, text in ROWS:
+        s = store.get(id)
+        assert (s.id, s.section_number, s.section_title) == (id, num, title or "")
+        assert s.text == text
+        assert store.text(id) == text
+
+def test_missing_id(tmp_path):
+    path = tmp_path / "sections.store"
+    build_store(ROWS, path)
+    store = open_store(path)
+    for id in (0, 8, 43, -1):
+        assert store.get(id) is None
+        assert store.text(id) is None
+
+def test_empty_store(tmp_path):
+    path = tmp_path / "sections.store"
+    assert build_store([], path) == 0
+    store = SectionStore(path)
+    assert len(store) == 0
+    assert store.get(1) is None
+
+def test_missing_file(tmp_path):
+    assert open_store(tmp_path / "nope.store") is None
+
+def test_reopen_after_replace(tmp_path):
+    path = tmp_path / "sections.store"
+    build_store(ROWS, path)
+    old = open_store(path)
+    assert open_store(path) is old  # unchanged file → same mapping
+
+    build_store([(7, "1", "Keine Strafe ohne Gesetz", "neu")], path)
+    new = open_store(path)
+    assert new is not old
+    assert len(new) == 1 and new.get(7).section_title == "Keine Strafe ohne Gesetz"
+    assert new.text(42) is None
+    assert old.text(42) == ROWS[0][3]  # old mapping stays readable
+    assert not os.path.exists(str(path) + ".tmp")
+
+class FakeCursor:
+    """Answers the header and text queries load_sections issues on a miss."""
+    def __init__(self, rows):
+        self.rows = {r[0]: r for r in rows}
+        self.queries = []
+
+    def execute(self, sql, params):
+        self.queries.append(" ".join(sql.split()))
+        rows = [self.rows[i] for i in params[0] if i in self.rows]
+        if "full_text" in sql:
+            self.result = [(r[0], r[3]) for r in rows]
+        else:
+            self.result = [r[:3] for r in rows]
+
+    def fetchall(self):
+        return self.result
+
+def test_load_sections_db_fallback_is_lazy(tmp_path, monkeypatch):
+    import embed.section_store as ss
+    monkeypatch.setattr(ss, "STORE_PATH", tmp_path / "sections.store")
+    build_store(ROWS[:1], ss.STORE_PATH)
+
+    cur = FakeCursor(ROWS)
+    secs = load_sections([42, 7, 13, 99], cur)
+    assert sorted(secs) == [7, 13, 42]
+    assert len(cur.queries) == 1 and "full_text" not in cur.queries[0]
+
+    assert secs[42].text == ROWS[0][3]  # store hit, no DB
+    assert len(cur.queries) == 1
+    assert secs[7].section_title == "" and secs[7].text == ROWS[1][3]
+    assert len(cur.queries) == 2 and "full_text" in cur.queries[1]
+    assert secs[13].text == ROWS[2][3]
+    secs[7].text
+    assert len(cur.queries) == 2  # one text query covers every miss